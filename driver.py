@@ -1,12 +1,14 @@
 import time
 import math
 import random
+import socket
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 
-from influxdb_client import InfluxDBClient, Point, WritePrecision
-from influxdb_client.client.write_api import SYNCHRONOUS
-from influxdb_client.rest import ApiException
+import numpy as np
+
+from influxdb_client import InfluxDBClient, WritePrecision
+from influxdb_client.client.write_api import WriteOptions
 
 
 # -------------------- 配置区（按需修改） --------------------
@@ -19,9 +21,30 @@ SENSOR_ID    = "temp-001"
 LOCATION     = "lab-A"
 UNIT         = "degC"
 
+# UDP 直写（可选）：如果部署的 Influx 开了 UDP listener，
+# 走裸 UDP 行协议可以完全绕开 HTTP 头解析和 TLS 握手。
+# 默认关闭，走 HTTP 批量写入
+USE_UDP      = False
+UDP_HOST     = "localhost"
+UDP_PORT     = 8089
+UDP_BATCH    = 100    # 每攒多少条 flush 一次
+UDP_MTU      = 1400   # 单个数据报的安全上限（字节），避免 IP 分片
+
 # 采样周期（秒）
 PERIOD_SEC   = 1.0
 
+# 批量写入配置：客户端后台线程攒批后一次性 flush，
+# 把 N 次 HTTP 往返合并成 1 次，大幅降低每点开销
+WRITE_OPTIONS = WriteOptions(
+    batch_size=5000,
+    flush_interval=10_000,      # ms
+    jitter_interval=2_000,      # ms
+    retry_interval=5_000,       # ms
+    max_retries=5,
+    max_retry_delay=30_000,     # ms
+    exponential_base=2,
+)
+
 # 温度模型参数
 BASELINE     = 22.0   # 基线温度（平均值）
 DIURNAL_AMP  = 3.0    # 日周期幅度（正弦项）
@@ -42,6 +65,7 @@ class TempSensorSim:
         self.drift_std = drift_std
         self.noise_std = noise_std
         self.drift = 0.0  # 累积随机游走
+        self._rng = np.random.default_rng()  # 批量生成用的持久 RNG
 
     def read(self, t: float) -> float:
         """
@@ -59,76 +83,128 @@ class TempSensorSim:
 
         return self.baseline + diurnal + self.drift + noise
 
+    def read_batch(self, ts: np.ndarray) -> np.ndarray:
+        """
+        ts: 时间戳数组（秒）
+        一次性返回 ts.size 个带噪声的温度读数（回填/模拟场景用）。
+        向量化版本：sin/正态噪声/cumsum 都在 NumPy 的 C 循环里跑，
+        比逐点调用 read() 快约两个数量级。
+        """
+        diurnal = self.diurnal_amp * np.sin(2 * np.pi * (ts % 86400) / 86400.0)
+
+        # 随机游走：逐步增量的 cumsum，起点接上当前的累积漂移
+        drifts = np.cumsum(self._rng.normal(0.0, self.drift_std, ts.size)) + self.drift
+        self.drift = float(drifts[-1])
+
+        noise = self._rng.normal(0.0, self.noise_std, ts.size)
+
+        return self.baseline + diurnal + drifts + noise
 
-def make_point(sensor_id: str, location: str, unit: str, value: float) -> Point:
+
+# 行协议的常量前缀（measurement + tags 不变），每个样本只拼数值和时间戳。
+# 直接发行协议字符串可以跳过 Point 对象构造和 SDK 的再序列化
+_LINE_PREFIX = f"sensor_temperature,sensor_id={SENSOR_ID},location={LOCATION},unit={UNIT} value="
+
+
+def make_line(value: float, ts: int) -> str:
     """
-    生成 InfluxDB Point：
+    生成一条行协议（line protocol）：
       measurement: sensor_temperature
       tags: sensor_id, location, unit
-      fields: value
+      fields: value（保留3位小数）
+      ts: 秒级时间戳（采样周期是 1 秒，秒级精度即可：行协议更短，
+          服务端对 delta 编码的整数秒压缩得也更好）
+    """
+    return f"{_LINE_PREFIX}{value:.3f} {ts}"
+
+
+def udp_flush(sock: socket.socket, lines: List[str]) -> None:
     """
-    p = (
-        Point("sensor_temperature")
-        .tag("sensor_id", sensor_id)
-        .tag("location", location)
-        .tag("unit", unit)
-        .field("value", float(f"{value:.3f}"))  # 保留3位小数
-        .time(time.time_ns(), WritePrecision.NS)
-    )
-    return p
+    把一批行协议按 MTU 切分后通过 UDP 发出去。
+    多条行之间用 '\\n' 连接；单个数据报不超过 UDP_MTU，避免 IP 分片。
+    """
+    chunk: List[str] = []
+    size = 0
+    for line in lines:
+        n = len(line) + 1  # 加上换行符
+        if chunk and size + n > UDP_MTU:
+            sock.sendto("\n".join(chunk).encode(), (UDP_HOST, UDP_PORT))
+            chunk, size = [], 0
+        chunk.append(line)
+        size += n
+    if chunk:
+        sock.sendto("\n".join(chunk).encode(), (UDP_HOST, UDP_PORT))
 
 
 def main():
-    # 建立 InfluxDB 客户端
-    client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG)
-    write_api = client.write_api(write_options=SYNCHRONOUS)
+    # 建立 InfluxDB 客户端（批量写入：重试/退避由客户端内部处理）
+    # enable_gzip: 行协议的 tag 重复度很高，gzip 通常能压缩 5~10 倍；
+    # 配合批量写入，每次 flush 对几千个点做一次压缩（InfluxDB 2.x 支持）
+    client = InfluxDBClient(url=INFLUX_URL, token=INFLUX_TOKEN, org=INFLUX_ORG,
+                            enable_gzip=True)
+    write_api = client.write_api(write_options=WRITE_OPTIONS)
 
     sensor = TempSensorSim()
 
+    # UDP 直写：一个持久 socket + 本地攒批；HTTP write_api 保留作后备
+    udp_sock: Optional[socket.socket] = None
+    udp_buf: List[str] = []
+    if USE_UDP:
+        udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Start streaming: "
           f"org='{INFLUX_ORG}', bucket='{INFLUX_BUCKET}', sensor_id='{SENSOR_ID}'")
     print("Press Ctrl+C to stop.\n")
 
-    backoff_sec = 1.0
-    max_backoff = 30.0
+    # 基于 monotonic 的无漂移调度：每轮推进 next_t += PERIOD_SEC，
+    # 只睡剩余时间，写入/打印的抖动不会累积到采样相位上
+    next_t = time.monotonic()
 
     try:
         while True:
             t = time.time()
             temp_val = sensor.read(t)
 
-            point = make_point(SENSOR_ID, LOCATION, UNIT, temp_val)
-
-            try:
-                write_api.write(bucket=INFLUX_BUCKET, org=INFLUX_ORG, record=point)
-                # 成功后重置退避
-                backoff_sec = 1.0
-                print(f"{datetime.now(timezone.utc).isoformat()} "
-                      f"-> {temp_val:.3f} {UNIT} (sensor_id={SENSOR_ID}, location={LOCATION})")
-            except ApiException as e:
-                # 典型：401 未授权、404 组织/桶错误、429/5xx 等
-                print(f"[WARN] Write failed (HTTP {e.status}): {e.body}")
-                print(f"        Backoff {backoff_sec:.1f}s and retry...")
-                time.sleep(backoff_sec)
-                backoff_sec = min(max_backoff, backoff_sec * 2)  # 指数退避
-                continue
-            except Exception as e:
-                print(f"[ERROR] Unexpected exception: {repr(e)}")
-                print(f"        Backoff {backoff_sec:.1f}s and retry...")
-                time.sleep(backoff_sec)
-                backoff_sec = min(max_backoff, backoff_sec * 2)
-                continue
-
-            # 正常采样间隔
-            time.sleep(PERIOD_SEC)
+            line = make_line(temp_val, int(t))
+
+            if udp_sock is not None:
+                udp_buf.append(line)
+                if len(udp_buf) >= UDP_BATCH:
+                    try:
+                        udp_flush(udp_sock, udp_buf)
+                        udp_buf.clear()
+                    except OSError as e:
+                        # UDP 发送失败就退回 HTTP 批量通道
+                        print(f"[WARN] UDP send failed ({e}), falling back to HTTP")
+                        for buffered in udp_buf:
+                            write_api.write(bucket=INFLUX_BUCKET, record=buffered,
+                                            write_precision=WritePrecision.S)
+                        udp_buf.clear()
+            else:
+                # 只入本地缓冲，后台线程负责攒批 flush 与失败重试
+                write_api.write(bucket=INFLUX_BUCKET, record=line,
+                                write_precision=WritePrecision.S)
+            print(f"{datetime.now(timezone.utc).isoformat()} "
+                  f"-> {temp_val:.3f} {UNIT} (sensor_id={SENSOR_ID}, location={LOCATION})")
+
+            # 正常采样间隔（按计划时刻补齐，落后时不睡直接追）
+            next_t += PERIOD_SEC
+            dt = next_t - time.monotonic()
+            if dt > 0:
+                time.sleep(dt)
 
     except KeyboardInterrupt:
         print("\n[INFO] Stopped by user (Ctrl+C).")
     finally:
-        try:
-            write_api.__del__()  # 确保刷新
-        except Exception:
-            pass
+        if udp_sock is not None:
+            if udp_buf:
+                try:
+                    udp_flush(udp_sock, udp_buf)
+                except OSError:
+                    pass
+            udp_sock.close()
+        # close() 会先 flush 缓冲中剩余的点再停掉后台线程
+        write_api.close()
         client.close()
         print("[INFO] Client closed.")
 
@@ -1,8 +1,11 @@
 from __future__ import annotations
+import asyncio
 import os
 import time
 import threading
-from typing import Optional, Dict, Generator
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import MappingProxyType
+from typing import Optional, Dict, Mapping, Tuple, Union
 from pathlib import Path
 from fastapi import FastAPI, Response, HTTPException
 from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
@@ -20,6 +23,12 @@ HEIGHT = int(os.getenv("CAMERA_HEIGHT", "480"))
 FPS = int(os.getenv("CAMERA_FPS", "10"))
 JPEG_QUALITY = int(os.getenv("CAMERA_JPEG_QUALITY", "85"))
 
+# MJPEG 流每帧的固定边界头（常量 bytes，避免每帧 f-string + encode）
+_BOUNDARY_HEAD = b"--frame\r\nContent-Type: image/jpeg\r\nContent-Length: "
+
+# 空帧槽位（还没抓到帧时的占位）：(jpeg, meta, 帧序号)
+_EMPTY_SLOT: Tuple[Optional[Union[bytes, memoryview]], Mapping[str, str], int] = (None, MappingProxyType({}), 0)
+
 # -------------------------------
 # 后台抓帧器
 # -------------------------------
@@ -33,27 +42,86 @@ class FrameGrabber:
         self.driver: Optional[USBCameraDriver] = None
         self.thread: Optional[threading.Thread] = None
         self.stop_evt = threading.Event()
-        self.lock = threading.Lock()
-        self.latest_frame: Optional[bytes] = None
-        self.latest_meta: Dict[str, str] = {}
+        # 最新帧槽位：(jpeg_bytes, meta, seq)。整体替换 tuple 在 GIL 下是
+        # 原子指针写，读者直接取槽位即可 —— 不加锁、不拷贝；
+        # meta 用 MappingProxyType 冻结，读者改不了共享视图
+        self._slot: Tuple[Optional[Union[bytes, memoryview]], Mapping[str, str], int] = _EMPTY_SLOT
         self.running: bool = False
+        # 订阅者计数：没人看流/取帧时跳过 JPEG 编码（编码是每帧最大 CPU 开销）
+        self.subscribers: int = 0
+        self._sub_lock = threading.Lock()
+        # 最新原始帧 (BGR ndarray, seq)，按需编码用；seq 单调递增，
+        # 用来判断槽位里的编码帧是否已经落后于最新抓到的帧
+        self._raw: Tuple[Optional[object], int] = (None, 0)
+        self._seq: int = 0  # 只在抓帧线程里递增
+        # 独立编码线程：抓帧循环不被编码延迟阻塞；
+        # 上一帧还没编完就直接丢掉当前帧（保持低延迟）
+        self._encoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="jpeg-enc")
+        self._encode_future: Optional[Future] = None
+        # asyncio 侧的新帧广播：抓帧线程经 call_soon_threadsafe 通知事件循环，
+        # async 消费者不用占用线程池线程等帧
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_event: Optional[asyncio.Event] = None
 
     def _loop(self):
         assert self.driver is not None
         self.running = True
         try:
             while not self.stop_evt.is_set():
-                m = self.driver.read()
-                if m is None:
+                # 排空积压取最新帧，观看端不会看到 100~300ms 前的画面
+                frame = self.driver.grab_latest_raw()
+                if frame is None:
                     # 小憩再试，避免空转
                     time.sleep(0.05)
                     continue
-                with self.lock:
-                    self.latest_frame = m.data
-                    self.latest_meta = m.meta
+                self._seq += 1
+                seq = self._seq
+                self._raw = (frame, seq)
+                if self.subscribers <= 0:
+                    continue  # 没人消费，不浪费编码
+                # 流水线：交给编码线程，抓帧不等编码；编码没跟上就丢帧
+                if self._encode_future is None or self._encode_future.done():
+                    self._encode_future = self._encoder.submit(self._encode_publish, frame, seq)
         finally:
             self.running = False
 
+    def _encode_publish(self, frame, seq: int) -> None:
+        driver = self.driver
+        if driver is None:
+            return
+        out = driver.encode_jpeg(frame)
+        if out is None:
+            return
+        data, meta = out
+        self._slot = (data, MappingProxyType(meta), seq)
+        loop = self._async_loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._publish_async)
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """绑定事件循环（在 startup 里调用一次）。"""
+        self._async_loop = loop
+        self._async_event = asyncio.Event()
+
+    def _publish_async(self) -> None:
+        # 广播模式：set 旧事件并换新事件，每个等待者醒一次，互不干扰
+        ev = self._async_event
+        self._async_event = asyncio.Event()
+        if ev is not None:
+            ev.set()
+
+    async def wait_next_jpeg_async(self, timeout: float = 1.0) -> Optional[Union[bytes, memoryview]]:
+        """等下一帧发布（不占线程池线程）；超时返回当前槽位（可能为 None）。"""
+        ev = self._async_event
+        if ev is None:
+            await asyncio.sleep(timeout)
+        else:
+            try:
+                await asyncio.wait_for(ev.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._slot[0]
+
     def _open_driver(self):
         self.driver = USBCameraDriver(
             device_index=self.device_index,
@@ -84,9 +152,8 @@ class FrameGrabber:
             self.thread.join(timeout=2.0)
         self.thread = None
         self._close_driver()
-        with self.lock:
-            self.latest_frame = None
-            self.latest_meta = {}
+        self._slot = _EMPTY_SLOT
+        self._raw = (None, self._seq)
 
     def set_enabled(self, flag: bool):
         if flag == self.enabled:
@@ -97,13 +164,45 @@ class FrameGrabber:
         else:
             self.stop()
 
-    def get_latest_jpeg(self) -> Optional[bytes]:
-        with self.lock:
-            return self.latest_frame
+    def add_subscriber(self) -> None:
+        with self._sub_lock:
+            self.subscribers += 1
+
+    def remove_subscriber(self) -> None:
+        with self._sub_lock:
+            self.subscribers = max(0, self.subscribers - 1)
+
+    def snapshot_jpeg(self) -> Optional[Union[bytes, memoryview]]:
+        """
+        单次取帧：槽位里的编码帧与最新抓到的帧同序号才直接复用；
+        落后了（比如流客户端都断开后 _loop 不再编码）就对最新原始帧
+        按需编码一次，并回填槽位，保证快照/状态永远是新鲜的。
+        """
+        data, _, slot_seq = self._slot
+        raw, raw_seq = self._raw
+        if data is not None and slot_seq == raw_seq:
+            return data
+        driver = self.driver
+        if raw is None or driver is None:
+            return data  # 没有原始帧可编，退回已有的（可能为 None）
+        out = driver.encode_jpeg(raw)
+        if out is None:
+            return data
+        jpeg, meta = out
+        self._slot = (jpeg, MappingProxyType(meta), raw_seq)
+        return jpeg
+
+    async def snapshot_jpeg_async(self) -> Optional[Union[bytes, memoryview]]:
+        """
+        async 版 snapshot_jpeg：编码是毫秒级的 CPU 活，放到编码线程执行，
+        不卡事件循环；且和 _encode_publish 同一个单线程池，
+        对共享的 TurboJPEG 实例天然串行，不会并发使用。
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._encoder, self.snapshot_jpeg)
 
-    def get_meta(self) -> Dict[str, str]:
-        with self.lock:
-            return dict(self.latest_meta)
+    def get_meta(self) -> Mapping[str, str]:
+        return self._slot[1]
 
 grabber = FrameGrabber()
 
@@ -120,17 +219,22 @@ if grabber.enabled:
 # -------------------------------
 app = FastAPI(title="USB Camera Service", version="0.1.0")
 
+@app.on_event("startup")
+async def _attach_grabber_loop():
+    # 把服务器的事件循环交给抓帧线程做 threadsafe 通知
+    grabber.attach_loop(asyncio.get_running_loop())
+
 @app.get("/health")
-def health():
+async def health():
     return {"ok": True, "enabled": grabber.enabled, "running": grabber.running}
 
 @app.get("/camera/status")
-def camera_status():
+async def camera_status():
     return {
         "enabled": grabber.enabled,
         "running": grabber.running,
         "device_index": grabber.device_index,
-        "meta": grabber.get_meta(),
+        "meta": dict(grabber.get_meta()),  # 冷路径，拷一份给 JSON 序列化
         "width": WIDTH,
         "height": HEIGHT,
         "fps": FPS,
@@ -151,46 +255,51 @@ def camera_enable(payload: Dict[str, bool]):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/camera/frame")
-def camera_frame():
+async def camera_frame():
     """
     返回最新一帧 JPEG（如果未启用或还没抓到帧 -> 404）。
     """
     if not grabber.enabled:
         raise HTTPException(status_code=409, detail="Camera disabled")
-    data = grabber.get_latest_jpeg()
+    data = await grabber.snapshot_jpeg_async()
     if not data:
         raise HTTPException(status_code=404, detail="No frame available yet")
-    return Response(content=data, media_type="image/jpeg")
+    # Response.render 只认 bytes；单次快照拷一份无妨
+    return Response(content=bytes(data), media_type="image/jpeg")
 
 @app.get("/camera/stream")
-def camera_stream():
+async def camera_stream():
     """
     简易 MJPEG 流。浏览器可直接打开；注意是 multipart/x-mixed-replace。
     """
     if not grabber.enabled:
         raise HTTPException(status_code=409, detail="Camera disabled")
 
-    boundary = "frame"
     headers = {
         "Age": "0",
         "Cache-Control": "no-cache, private",
         "Pragma": "no-cache",
-        "Content-Type": f"multipart/x-mixed-replace; boundary=--{boundary}",
+        "Content-Type": "multipart/x-mixed-replace; boundary=--frame",
     }
 
-    def gen() -> Generator[bytes, None, None]:
-        while True:
-            if not grabber.enabled:
-                break
-            frame = grabber.get_latest_jpeg()
-            if frame:
-                yield (
-                    f"--{boundary}\r\n"
-                    "Content-Type: image/jpeg\r\n"
-                    f"Content-Length: {len(frame)}\r\n\r\n"
-                ).encode("utf-8") + frame + b"\r\n"
-            else:
-                time.sleep(0.05)
+    async def gen():
+        grabber.add_subscriber()
+        try:
+            while True:
+                if not grabber.enabled:
+                    break
+                # 信号式唤醒：抓帧线程通知事件循环后立即醒来，
+                # 等待期间不占用 starlette 的线程池线程
+                frame = await grabber.wait_next_jpeg_async(timeout=1.0)
+                if frame:
+                    # 每帧合并成一个连续 bytes 再 yield：头+帧+尾走一次
+                    # socket send，而不是 3 次小块写（30 FPS 下省 2/3 的
+                    # 系统调用）。join 预先算好总长、一次分配，
+                    # 且直接接受 memoryview，不强制先拷成 bytes
+                    yield b"".join((_BOUNDARY_HEAD, str(len(frame)).encode("ascii"),
+                                    b"\r\n\r\n", frame, b"\r\n"))
+        finally:
+            grabber.remove_subscriber()
 
     return StreamingResponse(gen(), headers=headers)
 
@@ -210,5 +319,5 @@ def camera_reopen():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
-def root():
+async def root():
     return PlainTextResponse("USB Camera Service. See /health /camera/status /camera/frame /camera/stream /camera/enable")
@@ -2,25 +2,70 @@ from __future__ import annotations
 import cv2
 import time
 import threading
-from typing import Optional, Tuple, Generator, Dict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple, Generator, Dict, Union
 import numpy as np
 
 from .base import DriverBase
 from ..models.measurement import Measurement
 
+# 可选依赖：libjpeg-turbo（SIMD DCT/Huffman，比 OpenCV 的封装快 2~4 倍）
+# 装不上就回退到 cv2.imencode
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+except ImportError:
+    TurboJPEG = None  # type: ignore[assignment]
+    TJSAMP_420 = None
+
+
+# 上次探测成功的索引缓存：单次 VideoCapture 打开要 100~500ms，
+# 全量扫描可能耗时数秒，下次启动直接先试缓存值
+_INDEX_CACHE = Path.home() / ".cache" / "usb_camera" / "index"
+
+
+def _try_device(i: int) -> bool:
+    """试开一个索引并读一帧，判断设备是否可用。"""
+    cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)  # CAP_DSHOW 在 Windows 更稳定
+    if not cap.isOpened():
+        return False
+    ret, _ = cap.read()
+    cap.release()
+    return bool(ret)
+
+
+def _load_cached_index() -> Optional[int]:
+    try:
+        return int(_INDEX_CACHE.read_text().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_index(i: int) -> None:
+    try:
+        _INDEX_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        _INDEX_CACHE.write_text(str(i))
+    except OSError:
+        pass  # 缓存写不进去也不影响使用
+
 
 def _probe_device_index(max_index: int = 10) -> Optional[int]:
     """
     自动探测可用的摄像头索引（0..max_index-1）。
     在 Windows/笔记本上通常是 0。
+    先试上次缓存的索引；没命中再并行扫描
+    （capture 初始化卡在驱动 IO 上，不吃 GIL，多线程能重叠等待）。
     """
-    for i in range(max_index):
-        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)  # CAP_DSHOW 在 Windows 更稳定
-        if cap.isOpened():
-            ret, _ = cap.read()
-            cap.release()
-            if ret:
-                return i
+    cached = _load_cached_index()
+    if cached is not None and 0 <= cached < max_index and _try_device(cached):
+        return cached
+
+    with ThreadPoolExecutor(max_workers=4) as ex:
+        results = list(ex.map(_try_device, range(max_index)))
+    for i, ok in enumerate(results):
+        if ok:
+            _save_cached_index(i)
+            return i
     return None
 
 
@@ -49,8 +94,14 @@ class USBCameraDriver(DriverBase):
         self.backend = backend
 
         self._cap: Optional[cv2.VideoCapture] = None
-        self._last_frame_ts = 0.0
-        self._frame_interval = 1.0 / max(1, fps)
+
+        # TurboJPEG 实例只建一次；库存在但动态库加载失败时也回退 cv2
+        self._tj = None
+        if TurboJPEG is not None:
+            try:
+                self._tj = TurboJPEG()
+            except Exception:
+                self._tj = None
 
     def open(self) -> None:
         if self.device_index is None:
@@ -63,11 +114,20 @@ class USBCameraDriver(DriverBase):
         if not cap.isOpened():
             raise RuntimeError(f"无法打开摄像头：index={self.device_index}")
 
+        # 让摄像头直接输出 MJPEG：JPEG 在相机 ISP 里硬编码，
+        # USB 上传的是压缩流而不是未压缩 YUY2（高分辨率下 YUY2 常被带宽限到低帧率）。
+        # 设备不支持时该 set 会被忽略，照常工作
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+
         # 设置分辨率/帧率（部分设备可能不完全尊重）
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, float(self.width))
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, float(self.height))
         cap.set(cv2.CAP_PROP_FPS, float(self.fps))
 
+        # 尽量缩小设备端缓冲（hint，后端不一定支持）：
+        # 缓冲 2~3 帧时 read() 返回的是最旧的一帧，白增 100~300ms 延迟
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
         # 读取一次，确认可用
         ok, _ = cap.read()
         if not ok:
@@ -75,50 +135,91 @@ class USBCameraDriver(DriverBase):
             raise RuntimeError("摄像头打开但无法读取帧")
 
         self._cap = cap
-        self._last_frame_ts = 0.0
 
-    def _grab_encoded(self) -> Optional[Tuple[bytes, Dict[str, str]]]:
-        assert self._cap is not None
+    def grab_raw(self) -> Optional[np.ndarray]:
+        """
+        只抓一帧原始 BGR ndarray，不做 JPEG 编码。
+        编码是每帧最大的 CPU 开销，没有消费者时可以完全省掉。
+        """
+        if self._cap is None:
+            raise RuntimeError("请先调用 open()")
         ok, frame = self._cap.read()
         if not ok or frame is None:
             return None
+        return frame
+
+    def grab_latest_raw(self, drain_budget: float = 0.001) -> Optional[np.ndarray]:
+        """
+        排空设备端积压后取最新一帧（grab 不解码，排空开销极小）。
+        预算从第一次 grab 之前就开始计：缓冲为空时第一次 grab 要阻塞
+        等新帧，回来时预算已耗尽，直接 retrieve（不多吃一帧，保持满帧率）；
+        缓冲里是积压的旧帧时 grab 立即返回，剩余预算用来继续排空。
+        立即返回的后端（视频文件/虚拟相机）也被总时长兜底，不会死转。
+        """
+        if self._cap is None:
+            raise RuntimeError("请先调用 open()")
+        cap = self._cap
+        deadline = time.perf_counter() + drain_budget
+        if not cap.grab():
+            return None
+        while time.perf_counter() < deadline:
+            if not cap.grab():
+                break  # 没有更多积压，用已 grab 到的那帧
+        ok, frame = cap.retrieve()
+        if not ok or frame is None:
+            return None
+        return frame
 
-        # 统一为 BGR（OpenCV 默认），可按需做颜色空间转换
+    def encode_jpeg(self, frame: np.ndarray) -> Optional[Tuple[Union[bytes, memoryview], Dict[str, str]]]:
+        """
+        把一帧 BGR ndarray 编码为 JPEG，返回 (bytes-like, meta)。
+        与 grab_raw 分离后，编码可以放到独立线程或按需执行。
+        下游（socket/文件写出）只需要只读的 bytes-like 对象，
+        所以 cv2 路径直接返回编码缓冲的 memoryview，省掉 tobytes() 的整帧拷贝。
+        """
         h, w = frame.shape[:2]
 
-        # JPEG 编码
-        encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality)]
-        ok, buf = cv2.imencode(".jpg", frame, encode_params)
-        if not ok:
-            return None
+        if self._tj is not None:
+            # 4:2:0 子采样：色度字节减半，也是摄像头 MJPEG 的常见格式
+            data = self._tj.encode(frame, quality=self.jpeg_quality,
+                                   jpeg_subsample=TJSAMP_420)
+        else:
+            encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(self.jpeg_quality)]
+            ok, buf = cv2.imencode(".jpg", frame, encode_params)
+            if not ok:
+                return None
+            data = memoryview(buf).cast("B")
 
         meta = {
             "width": str(w),
             "height": str(h),
             "format": "jpeg",
         }
-        return (buf.tobytes(), meta)
+        return (data, meta)
+
+    def _grab_encoded(self) -> Optional[Tuple[bytes, Dict[str, str]]]:
+        frame = self.grab_raw()
+        if frame is None:
+            return None
+        return self.encode_jpeg(frame)
 
     def read(self) -> Optional[Measurement]:
         """
-        同步读取一帧；若要固定 FPS，可以 sleep。
+        同步读取一帧。
+        不再额外 sleep 限速：摄像头硬件本身按配置的 FPS 出帧，
+        cap.read() 会阻塞到下一帧；叠加 sleep 只会增加延迟，
+        还让消费者在卡顿后永远追不上。需要更低频率时在调用方
+        用 monotonic 调度（参考 driver.py 的采样循环）。
         """
         if self._cap is None:
             raise RuntimeError("请先调用 open()")
 
-        # 控制采样间隔（简单限速）
-        now = time.perf_counter()
-        dt = now - self._last_frame_ts
-        if dt < self._frame_interval:
-            time.sleep(self._frame_interval - dt)
-        self._last_frame_ts = time.perf_counter()
-
         out = self._grab_encoded()
         if out is None:
             return None
         data, meta = out
         return Measurement(
-            timestamp=Measurement.now_iso(),
+            timestamp_ns=Measurement.now_ns(),
             data=data,
             meta=meta,
             semantic_id=None,  # 以后接 VSS/IEC 61360 时再填
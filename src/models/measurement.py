@@ -1,6 +1,7 @@
 from __future__ import annotations
+import time
 from dataclasses import dataclass
-from typing import Optional, Dict
+from typing import Optional, Dict, Union
 from datetime import datetime, timezone
 
 
@@ -8,12 +9,20 @@ from datetime import datetime, timezone
 class Measurement:
     """
     通用测量数据结构（这里用于视频帧）。
+    时间戳存 epoch 纳秒整数；ISO 字符串只在访问时才格式化
+    （30 FPS 下每帧构造 datetime + isoformat 是白白的开销）。
     """
-    timestamp: str                # ISO8601，例如 "2025-10-23T12:34:56.789Z"
-    data: bytes                   # 原始数据（这里存JPEG编码后的图像字节）
+    timestamp_ns: int             # 采集时刻，epoch 纳秒（time.time_ns()）
+    data: Union[bytes, memoryview]  # 原始数据（JPEG图像字节；memoryview 可避免整帧拷贝）
     meta: Dict[str, str]          # 元数据：width/height/format 等
     semantic_id: Optional[str] = None  # 语义ID（预留给 VSS/IEC61360）
 
+    @property
+    def timestamp(self) -> str:
+        """ISO8601（毫秒精度），例如 "2025-10-23T12:34:56.789Z"，按需惰性生成"""
+        dt = datetime.fromtimestamp(self.timestamp_ns / 1e9, tz=timezone.utc)
+        return f"{dt:%Y-%m-%dT%H:%M:%S}.{dt.microsecond // 1000:03d}Z"
+
     @staticmethod
-    def now_iso() -> str:
-        return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+    def now_ns() -> int:
+        return time.time_ns()